@@ -1,11 +1,249 @@
+import atexit
+import functools
 import logging
-from datetime import datetime, timedelta
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime
 import numpy as np
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import smtplib
 from email.mime.text import MIMEText
 import json
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from itertools import chain
+import secrets
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, fall back to plain numpy
+    njit = None
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional, pattern results are not cached without it
+    xxhash = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Idle SMTP sessions shared by every monitor in the process, keyed by
+# (host, port, use_tls, auth). Sessions are checked out for a whole alert
+# flush, so no two monitors ever write to the same session at once.
+_SMTP_POOL: Dict[Tuple[Any, ...], List["_PooledSMTP"]] = {}
+_SMTP_POOL_LOCK = threading.Lock()
+_SMTP_POOL_MAX_IDLE = 5  # Idle sessions kept per endpoint
+
+_STOP = object()  # Sentinel telling the incident worker to exit
+
+# Per-process seed so cache keys cannot be targeted with precomputed collisions
+_HASH_SEED = secrets.randbits(64)
+
+
+def _any_gt(
+    flat: np.ndarray,
+    threshold: float,
+    abs_buf: np.ndarray,
+    mask_buf: np.ndarray
+) -> bool:
+    """
+    Check whether any absolute value exceeds threshold, stopping at the first hit
+    
+    Works through flat in chunks of mask_buf.size, writing into the given
+    scratch buffers instead of allocating temporaries for every chunk.
+    """
+    # A float64 threshold keeps numpy from casting it down to narrow dtypes
+    # such as float16, where 1e6 would overflow to inf
+    threshold = np.float64(threshold)
+    chunk = mask_buf.size
+    for start in range(0, flat.size, chunk):
+        part = flat[start:start + chunk]
+        n = part.size
+        np.abs(part, out=abs_buf[:n])
+        np.greater(abs_buf[:n], threshold, out=mask_buf[:n])
+        if mask_buf[:n].any():
+            return True
+    return False
+
+
+def _scan_numpy(
+    flat: np.ndarray,
+    threshold: float,
+    abs_buf: np.ndarray,
+    mask_buf: np.ndarray
+) -> Tuple[bool, int, int]:
+    """
+    Return (any absolute value above threshold, non-zero count, size) of a flat array
+    """
+    return _any_gt(flat, threshold, abs_buf, mask_buf), int(np.count_nonzero(flat)), flat.size
+
+
+def _scan_loop(flat, threshold):
+    n = flat.size
+    nnz = 0
+    extreme = False
+    i = 0
+    while i < n:
+        x = flat[i]
+        i += 1
+        if x != 0:
+            nnz += 1
+        if abs(x) > threshold:
+            extreme = True
+            break
+    # Past the first extreme value only the non-zero count is still needed
+    while i < n:
+        if flat[i] != 0:
+            nnz += 1
+        i += 1
+    return extreme, nnz, n
+
+
+# Single-pass version of _scan_numpy, only usable on native int/float arrays
+_scan_numba = njit(cache=True)(_scan_loop) if njit is not None else None
+
+# dtype.char codes numba can compile _scan_loop for; float16 and longdouble
+# are not among them and take the numpy path
+_NUMBA_DTYPE_CHARS = "bBhHiIlLqQfd"
+
+
+# Compact stdlib encoder, matching orjson's output for log lines
+_DUMPS = functools.partial(json.dumps, separators=(",", ":"))
+
+
+def _to_json(obj: Any, indent: bool = False) -> str:
+    """
+    Serialize obj to JSON, using orjson when available
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None).decode()
+    if indent:
+        return json.dumps(obj, indent=2)
+    return _DUMPS(obj)
+
+
+class _PooledSMTP:
+    """
+    SMTP session plus the number of messages sent on it
+    """
+    __slots__ = ("server", "sent")
+    
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+    
+    def close(self) -> None:
+        """
+        End the session, dropping the socket if the server is already gone
+        """
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+
+
+def _close_smtp_pool() -> None:
+    """
+    Close every idle pooled SMTP session
+    """
+    with _SMTP_POOL_LOCK:
+        idle = [conn for conns in _SMTP_POOL.values() for conn in conns]
+        _SMTP_POOL.clear()
+    for conn in idle:
+        conn.close()
+
+
+# Registered at import, so it runs after every monitor's close() at exit
+atexit.register(_close_smtp_pool)
+
+
+# Process-wide log listener, started by the first monitor and stopped at exit
+_LOG_LISTENER: Optional[logging.handlers.QueueListener] = None
+_LOG_LOCK = threading.Lock()
+
+
+def _configure_logging(logging_path: str) -> None:
+    """
+    Route root logging to logging_path through a background listener
+    
+    Like basicConfig, this does nothing when the root logger already has
+    handlers. Records are queued and written to disk by the listener thread
+    so detect_threat never waits on file I/O.
+    """
+    global _LOG_LISTENER
+    with _LOG_LOCK:
+        root_logger = logging.getLogger()
+        if root_logger.handlers:
+            return
+        file_handler = logging.FileHandler(logging_path, delay=True)
+        file_handler.setFormatter(
+            logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        )
+        log_queue = queue.Queue(-1)
+        _LOG_LISTENER = logging.handlers.QueueListener(log_queue, file_handler)
+        _LOG_LISTENER.start()
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        root_logger.setLevel(logging.INFO)
+
+
+def _stop_logging() -> None:
+    """
+    Write out queued log records and close the log file
+    """
+    global _LOG_LISTENER
+    with _LOG_LOCK:
+        listener, _LOG_LISTENER = _LOG_LISTENER, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+# Registered at import, so it runs after every monitor's close() at exit
+atexit.register(_stop_logging)
+
+
+def _array_key(input_array: np.ndarray) -> Optional[Tuple[Any, ...]]:
+    """
+    Build a pattern cache key from array metadata and a hash of its contents
+    """
+    # Object arrays hold pointers, so their bytes say nothing about the values
+    if xxhash is None or input_array.dtype.kind not in "biufc":
+        return None
+    digest = xxhash.xxh3_128_intdigest(np.ascontiguousarray(input_array), seed=_HASH_SEED)
+    return input_array.shape, input_array.dtype.str, digest
+
+
+@dataclass(slots=True)
+class ThreatAssessment:
+    """
+    Result of analyzing a single request
+    
+    Fields are read as attributes; use to_dict() where a plain dictionary
+    is needed.
+    """
+    timestamp: str = ""
+    severity: str = "low"
+    threats_detected: List[str] = field(default_factory=list)
+    details: Dict[str, Any] = field(default_factory=dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert to a plain dictionary
+        """
+        return {
+            "timestamp": self.timestamp,
+            "severity": self.severity,
+            "threats_detected": self.threats_detected,
+            "details": self.details
+        }
+
 
 class AISecurityMonitor:
     def __init__(
@@ -27,47 +265,116 @@ class AISecurityMonitor:
                         "max_requests_per_minute": int,
                         "suspicious_pattern_threshold": float,
                         "failed_attempts_threshold": int
-                    }
+                    },
+                    "incident_log_size": optional int, number of most recent
+                        incidents kept in memory (default 100000)
                 }
         """
         self.model_name = model_name
         self.alert_settings = alert_settings
-        self.incident_log = []
-        self.request_history = defaultdict(list)  # IP address -> list of timestamps
+        
+        # Thresholds never change after init, so resolve them once
+        self._max_rpm = alert_settings["alert_thresholds"]["max_requests_per_minute"]
+        
+        incident_log_size = alert_settings.get("incident_log_size", 100_000)
+        if incident_log_size < 1:
+            raise ValueError(f"incident_log_size must be at least 1, got {incident_log_size}")
+        self.incident_log = deque(maxlen=incident_log_size)
+        # Hour since the epoch -> incidents logged during that hour, oldest first
+        self._incident_buckets: Dict[int, deque] = defaultdict(deque)
+        # IP address -> most recent monotonic request times; only the last
+        # max_requests_per_minute + 1 entries matter for the rate check
+        self.request_history = defaultdict(lambda: deque(maxlen=self._max_rpm + 1))
+        # Hour since the epoch -> threat counts of the incidents in that bucket
+        self._bucket_threats: Dict[int, Counter] = defaultdict(Counter)
+        self._pattern_cache = OrderedDict()  # Array key -> pattern analysis result
+        self._pattern_cache_size = 1024
+        self._pattern_cache_lock = threading.Lock()  # detect_threat may run on many threads
+        # Per-thread scratch buffers for the numpy scan, reused across calls
+        self._scratch = threading.local()
+        self._scratch_size = 65536
+        # SMTP settings and alert headers are fixed per monitor
+        smtp_settings = alert_settings["smtp_settings"]
+        self._smtp_host = smtp_settings["server"]
+        self._smtp_port = smtp_settings["port"]
+        self._smtp_use_tls = bool(smtp_settings.get("use_tls"))
+        self._smtp_auth = (
+            (smtp_settings["username"], smtp_settings.get("password"))
+            if "username" in smtp_settings else None
+        )
+        self._smtp_pool_key = (self._smtp_host, self._smtp_port, self._smtp_use_tls, self._smtp_auth)
+        # Sessions are retired after this many messages and replaced with new ones
+        self._smtp_max_messages = smtp_settings.get("max_messages_per_connection", 100)
+        self._mail_from = smtp_settings["sender"]
+        self._mail_to = ', '.join(alert_settings["email_recipients"])
+        self._subject_prefix = f"Security Alert: {model_name} - "
+        self._alert_queue: List[MIMEText] = []  # Alerts waiting for the next flush
+        self._alert_lock = threading.Lock()  # Guards _alert_queue and _alert_queued_at
+        self._alert_flush_threshold = 10
+        self._alert_max_age = 5.0  # Seconds the oldest queued alert may wait
+        self._alert_queued_at = 0.0  # Monotonic time the oldest queued alert arrived
         
         # Configure logging
-        logging.basicConfig(
-            filename=logging_path or f"security_{model_name}_{datetime.now():%Y%m%d}.log",
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
+        _configure_logging(
+            logging_path or f"security_{model_name}_{datetime.now():%Y%m%d}.log"
+        )
+        
+        # Incidents are persisted and alerted on by a background worker so
+        # detect_threat never waits on log writes or SMTP round trips
+        self._incident_lock = threading.Lock()  # Guards incident history
+        self._incident_q = queue.SimpleQueue()
+        # Held while handing an incident to the worker and while close()
+        # retires it, so nothing can be queued behind the stop sentinel
+        self._handoff_lock = threading.Lock()
+        self._incident_batch_size = 32
+        self._worker = threading.Thread(
+            target=self._drain, name=f"security-monitor-{model_name}", daemon=True
         )
+        self._worker.start()
+        
+        atexit.register(self.close)
     
-    def detect_threat(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    def close(self) -> None:
+        """
+        Persist queued incidents and send pending alerts
+        
+        Logging is shared by every monitor in the process and keeps running
+        until interpreter exit.
+        """
+        with self._handoff_lock:
+            worker, self._worker = self._worker, None
+            if worker is not None:
+                self._incident_q.put(_STOP)
+        if worker is not None:
+            worker.join()
+        
+        self._flush_alerts()
+    
+    def detect_threat(self, request_data: Dict[str, Any]) -> ThreatAssessment:
         """
         Analyze request for potential security threats
+        
+        The assessment timestamp is only filled in when threats are detected.
         """
-        threat_assessment = {
-            "timestamp": datetime.now().isoformat(),
-            "severity": "low",
-            "threats_detected": [],
-            "details": {}
-        }
+        now = time.time()
+        threat_assessment = ThreatAssessment()
         
         # Check request rate
         if self._check_rate_limit(request_data["ip_address"]):
-            threat_assessment["threats_detected"].append("rate_limit_exceeded")
-            threat_assessment["severity"] = "medium"
+            threat_assessment.threats_detected.append("rate_limit_exceeded")
+            threat_assessment.severity = "medium"
         
         # Check input patterns
         pattern_check = self._analyze_input_patterns(request_data["input_data"])
         if pattern_check["suspicious_patterns"]:
-            threat_assessment["threats_detected"].extend(pattern_check["suspicious_patterns"])
-            threat_assessment["severity"] = "high"
-            threat_assessment["details"]["patterns"] = pattern_check
+            threat_assessment.threats_detected.extend(pattern_check["suspicious_patterns"])
+            threat_assessment.severity = "high"
+            threat_assessment.details["patterns"] = pattern_check
         
         # Log the threat assessment
-        if threat_assessment["threats_detected"]:
-            self._log_incident(threat_assessment, request_data)
+        if threat_assessment.threats_detected:
+            threat_assessment.timestamp = datetime.fromtimestamp(now).isoformat()
+            self._log_incident(threat_assessment, request_data, now)
         
         return threat_assessment
     
@@ -75,79 +382,232 @@ class AISecurityMonitor:
         """
         Check if request rate from IP exceeds threshold
         """
-        current_time = datetime.now()
-        recent_requests = [
-            timestamp for timestamp in self.request_history[ip_address]
-            if current_time - timestamp < timedelta(minutes=1)
-        ]
+        current_time = time.monotonic()
+        history = self.request_history[ip_address]
+        
+        # Drop timestamps that fell out of the one minute window
+        while history and current_time - history[0] >= 60.0:
+            history.popleft()
+        
+        exceeded = len(history) > self._max_rpm
         
         # Update request history
-        self.request_history[ip_address] = recent_requests + [current_time]
+        history.append(current_time)
         
-        return len(recent_requests) > self.alert_settings["alert_thresholds"]["max_requests_per_minute"]
+        return exceeded
     
     def _analyze_input_patterns(self, input_data: Any) -> Dict[str, Any]:
         """
         Analyze input for suspicious patterns
+        
+        Only bool, integer, float and complex arrays are scored. Anything
+        else, including object arrays of Python numbers such as [1, 2**70],
+        is reported as "analysis_error".
         """
         result = {
             "suspicious_patterns": [],
             "details": {}
         }
+        key = None
         
         try:
-            input_array = np.asarray(input_data)
+            # Normalize to one contiguous, native byte order buffer up front so
+            # the checks below never trigger hidden copies of their own
+            input_array = np.ascontiguousarray(np.asarray(input_data))
+            dtype = input_array.dtype
+            # Object arrays are rejected even when every element is a number
+            if dtype.kind not in "biufc":
+                raise TypeError(f"unsupported input dtype {dtype}")
+            if not dtype.isnative:
+                input_array = input_array.astype(dtype.newbyteorder("="))
+                dtype = input_array.dtype
+            
+            # Reuse the analysis of a previously seen identical input
+            key = _array_key(input_array)
+            if key is not None:
+                with self._pattern_cache_lock:
+                    cached = self._pattern_cache.get(key)
+                    if cached is not None:
+                        self._pattern_cache.move_to_end(key)
+                if cached is not None:
+                    return self._copy_patterns(cached)
+            
+            flat = input_array.ravel()
+            
+            # Stream the input once for both magnitude and sparsity
+            if _scan_numba is not None and dtype.char in _NUMBA_DTYPE_CHARS:
+                extreme, nnz, size = _scan_numba(flat, 1e6)
+            else:
+                extreme, nnz, size = _scan_numpy(flat, 1e6, *self._scan_buffers(dtype))
             
             # Check for extreme values
-            if np.any(np.abs(input_array) > 1e6):
+            if extreme:
                 result["suspicious_patterns"].append("extreme_values")
             
             # Check for unusual sparsity
-            sparsity = np.count_nonzero(input_array) / input_array.size
+            sparsity = nnz / size if size else float("nan")
             if sparsity < 0.01:
                 result["suspicious_patterns"].append("suspicious_sparsity")
             
-            # Check for repeating patterns
-            if len(input_array.shape) > 1:
-                gradient = np.gradient(input_array.astype(float))
-                if np.all(np.abs(gradient) > 100):
+            # Check for repeating patterns: every adjacent difference is large
+            if input_array.ndim > 1:
+                # Integer differences can wrap around, so only floats stay native
+                values = input_array if dtype.kind == "f" else input_array.astype(float)
+                axes = [axis for axis, length in enumerate(values.shape) if length > 1]
+                if axes and all(
+                    np.abs(np.diff(values, axis=axis)).min() > 100
+                    for axis in axes
+                ):
                     result["suspicious_patterns"].append("potential_adversarial_pattern")
             
         except Exception as e:
-            logging.error(f"Pattern analysis error: {str(e)}")
+            logger.error("Pattern analysis error: %s", e)
             result["suspicious_patterns"].append("analysis_error")
+            # Never cache a failed analysis, it may not be about the input
+            key = None
+        
+        if key is not None:
+            with self._pattern_cache_lock:
+                self._pattern_cache[key] = self._copy_patterns(result)
+                if len(self._pattern_cache) > self._pattern_cache_size:
+                    self._pattern_cache.popitem(last=False)
         
         return result
     
-    def _log_incident(self, threat_assessment: Dict[str, Any], request_data: Dict[str, Any]) -> None:
+    def _scan_buffers(self, dtype: np.dtype) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Log security incident and send alerts if needed
+        Return this thread's (abs, mask) scratch buffers for inputs of dtype
+        """
+        buffers = getattr(self._scratch, "buffers", None)
+        if buffers is None:
+            buffers = self._scratch.buffers = {}
+        scratch = buffers.get(dtype)
+        if scratch is None:
+            # Probe abs's result dtype (complex gives float) only on a miss
+            abs_dtype = np.abs(np.empty(0, dtype=dtype)).dtype
+            scratch = buffers[dtype] = (
+                np.empty(self._scratch_size, dtype=abs_dtype),
+                np.empty(self._scratch_size, dtype=bool)
+            )
+        return scratch
+    
+    @staticmethod
+    def _copy_patterns(result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copy a pattern analysis result so callers cannot mutate cached entries
+        """
+        return {
+            "suspicious_patterns": list(result["suspicious_patterns"]),
+            "details": dict(result["details"])
+        }
+    
+    def _log_incident(
+        self,
+        threat_assessment: ThreatAssessment,
+        request_data: Dict[str, Any],
+        detected_at: float
+    ) -> None:
+        """
+        Hand security incident off to the background worker
         """
         incident = {
-            "timestamp": threat_assessment["timestamp"],
-            "severity": threat_assessment["severity"],
-            "threats": threat_assessment["threats_detected"],
+            "timestamp": threat_assessment.timestamp,
+            "severity": threat_assessment.severity,
+            "threats": list(threat_assessment.threats_detected),
             "ip_address": request_data["ip_address"],
-            "details": threat_assessment["details"]
+            "details": dict(threat_assessment.details),
+            "_ts": detected_at  # Epoch seconds, used for time window queries
         }
         
-        # Log to file
-        logging.warning(f"Security incident detected: {json.dumps(incident)}")
+        with self._handoff_lock:
+            if self._worker is not None:
+                self._incident_q.put(incident)
+                return
         
-        # Store in incident history
-        self.incident_log.append(incident)
+        # Monitor was closed, there is no worker left to hand off to or
+        # to flush later, so send any alert right away
+        self._persist_and_alert(incident)
+        self._flush_alerts()
+    
+    def _drain(self) -> None:
+        """
+        Persist queued incidents in batches until told to stop
+        """
+        while True:
+            batch = [self._incident_q.get()]
+            while len(batch) < self._incident_batch_size:
+                try:
+                    batch.append(self._incident_q.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # close() queues nothing behind _STOP, so it always ends a batch
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            for incident in batch:
+                try:
+                    self._persist_and_alert(incident)
+                except Exception as e:
+                    logger.error("Failed to persist incident: %s", e)
+            
+            # One SMTP session per burst; no alert outlives a drain cycle
+            self._flush_alerts()
+            if stop:
+                return
+    
+    def _persist_and_alert(self, incident: Dict[str, Any]) -> None:
+        """
+        Log security incident and send alerts if needed
+        """
+        # Log to file, skipping serialization when warnings are filtered out
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("Security incident detected: %s", _to_json(incident))
         
-        # Send alert if severity warrants it
-        if threat_assessment["severity"] in ["medium", "high"]:
-            self._send_alert(incident)
+        # Store in incident history, evicting the oldest incident when full
+        with self._incident_lock:
+            if len(self.incident_log) == self.incident_log.maxlen:
+                self._evict_incident(self.incident_log[0])
+            self.incident_log.append(incident)
+            self._incident_buckets[int(incident["_ts"] // 3600)].append(incident)
+            self._bucket_threats[int(incident["_ts"] // 3600)].update(incident["threats"])
+        
+        # Queue alert if severity warrants it; high severity goes out immediately
+        # and nothing waits in the queue longer than _alert_max_age
+        if incident["severity"] in ["medium", "high"]:
+            msg = self._build_alert(incident)
+            now = time.monotonic()
+            with self._alert_lock:
+                if not self._alert_queue:
+                    self._alert_queued_at = now
+                self._alert_queue.append(msg)
+                flush = (
+                    incident["severity"] == "high"
+                    or len(self._alert_queue) >= self._alert_flush_threshold
+                    or now - self._alert_queued_at >= self._alert_max_age
+                )
+            if flush:
+                self._flush_alerts()
     
-    def _send_alert(self, incident: Dict[str, Any]) -> None:
+    def _evict_incident(self, incident: Dict[str, Any]) -> None:
         """
-        Send alert to security team
+        Remove the oldest incident from the hour index and its threat counts
         """
-        try:
-            subject = f"Security Alert: {self.model_name} - {incident['severity'].upper()} Severity"
-            body = f"""
+        bucket_key = int(incident["_ts"] // 3600)
+        bucket = self._incident_buckets[bucket_key]
+        bucket.popleft()
+        if bucket:
+            self._bucket_threats[bucket_key].subtract(incident["threats"])
+        else:
+            del self._incident_buckets[bucket_key]
+            del self._bucket_threats[bucket_key]
+    
+    def _build_alert(self, incident: Dict[str, Any]) -> MIMEText:
+        """
+        Build alert email for security team
+        """
+        subject = f"{self._subject_prefix}{incident['severity'].upper()} Severity"
+        body = f"""
 Security incident detected:
 -------------------------
 Timestamp: {incident['timestamp']}
@@ -156,59 +616,142 @@ Threats Detected: {', '.join(incident['threats'])}
 IP Address: {incident['ip_address']}
 
 Details:
-{json.dumps(incident['details'], indent=2)}
+{_to_json(incident['details'], indent=True)}
 
 Please review the incident and take appropriate action.
 """
-            
-            msg = MIMEText(body)
-            msg['Subject'] = subject
-            msg['From'] = self.alert_settings["smtp_settings"]["sender"]
-            msg['To'] = ', '.join(self.alert_settings["email_recipients"])
-            
-            # Send email
-            with smtplib.SMTP(
-                self.alert_settings["smtp_settings"]["server"],
-                self.alert_settings["smtp_settings"]["port"]
-            ) as server:
-                if self.alert_settings["smtp_settings"].get("use_tls"):
-                    server.starttls()
-                if "username" in self.alert_settings["smtp_settings"]:
-                    server.login(
-                        self.alert_settings["smtp_settings"]["username"],
-                        self.alert_settings["smtp_settings"]["password"]
-                    )
-                server.send_message(msg)
-                
-        except Exception as e:
-            logging.error(f"Failed to send alert: {str(e)}")
+        
+        msg = MIMEText(body)
+        msg['Subject'] = subject
+        msg['From'] = self._mail_from
+        msg['To'] = self._mail_to
+        return msg
+    
+    def _flush_alerts(self) -> None:
+        """
+        Send all queued alerts over a single pooled SMTP session
+        """
+        with self._alert_lock:
+            pending, self._alert_queue = self._alert_queue, []
+        if not pending:
+            return
+        conn = None
+        for msg in pending:
+            try:
+                if conn is None:
+                    conn = self._get_smtp()
+                conn.server.send_message(msg)
+                conn.sent += 1
+                if conn.sent >= self._smtp_max_messages:
+                    self._release_smtp(conn)
+                    conn = None
+            except Exception as e:
+                logger.error("Failed to send alert: %s", e)
+                # Drop the session so the next alert reconnects
+                if conn is not None:
+                    conn.close()
+                    conn = None
+        
+        if conn is not None:
+            self._release_smtp(conn)
+    
+    def _get_smtp(self) -> _PooledSMTP:
+        """
+        Check out a live SMTP session from the pool, connecting if none is idle
+        """
+        while True:
+            with _SMTP_POOL_LOCK:
+                idle = _SMTP_POOL.get(self._smtp_pool_key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                break
+            try:
+                if conn.server.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            conn.close()
+        
+        server = smtplib.SMTP(self._smtp_host, self._smtp_port)
+        try:
+            if self._smtp_use_tls:
+                server.starttls()
+            if self._smtp_auth is not None:
+                server.login(*self._smtp_auth)
+        except Exception:
+            server.close()
+            raise
+        
+        return _PooledSMTP(server)
+    
+    def _release_smtp(self, conn: _PooledSMTP) -> None:
+        """
+        Return a checked out SMTP session to the pool, or retire it
+        """
+        if conn.sent < self._smtp_max_messages:
+            with _SMTP_POOL_LOCK:
+                idle = _SMTP_POOL.setdefault(self._smtp_pool_key, [])
+                if len(idle) < _SMTP_POOL_MAX_IDLE:
+                    idle.append(conn)
+                    return
+        conn.close()
     
     def get_incident_summary(self, hours: int = 24) -> Dict[str, Any]:
         """
         Get summary of recent security incidents
-        """
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        recent_incidents = [
-            incident for incident in self.incident_log
-            if datetime.fromisoformat(incident["timestamp"]) > cutoff_time
-        ]
         
-        return {
-            "total_incidents": len(recent_incidents),
-            "by_severity": {
-                severity: len([i for i in recent_incidents if i["severity"] == severity])
-                for severity in ["low", "medium", "high"]
-            },
-            "unique_ips": len(set(incident["ip_address"] for incident in recent_incidents)),
-            "most_common_threats": self._get_common_threats(recent_incidents)
-        }
+        Incidents are persisted in the background, so one detected moments
+        ago may not be counted yet.
+        """
+        with self._incident_lock:
+            now = time.time()
+            cutoff_time = now - hours * 3600
+            
+            # Only the bucket holding the cutoff needs a per-incident check
+            first_bucket = int(cutoff_time // 3600)
+            last_bucket = int(now // 3600)
+            buckets = self._incident_buckets
+            if last_bucket - first_bucket >= len(buckets):
+                later_buckets = sorted(
+                    bucket for bucket in buckets if first_bucket < bucket <= last_bucket
+                )
+            else:
+                later_buckets = range(first_bucket + 1, last_bucket + 1)
+            boundary_incidents = [
+                incident for incident in buckets.get(first_bucket, ())
+                if incident["_ts"] > cutoff_time
+            ]
+            recent_incidents = boundary_incidents + list(
+                chain.from_iterable(buckets.get(bucket, ()) for bucket in later_buckets)
+            )
+            
+            return {
+                "total_incidents": len(recent_incidents),
+                "by_severity": {
+                    severity: len([i for i in recent_incidents if i["severity"] == severity])
+                    for severity in ["low", "medium", "high"]
+                },
+                "unique_ips": len(set(incident["ip_address"] for incident in recent_incidents)),
+                "most_common_threats": self._get_common_threats(
+                    boundary_incidents, later_buckets
+                )
+            }
     
-    def _get_common_threats(self, incidents: List[Dict[str, Any]]) -> Dict[str, int]:
+    def _get_common_threats(
+        self,
+        boundary_incidents: List[Dict[str, Any]],
+        later_buckets: Iterable[int]
+    ) -> Dict[str, int]:
         """
         Get count of most common threat types
+        
+        Incidents in the cutoff bucket are counted one by one; every later
+        bucket contributes its running per-hour counts.
         """
-        threat_counts = defaultdict(int)
-        for incident in incidents:
-            for threat in incident["threats"]:
-                threat_counts[threat] += 1
-        return dict(sorted(threat_counts.items(), key=lambda x: x[1], reverse=True))
\ No newline at end of file
+        threat_counts = Counter()
+        for incident in boundary_incidents:
+            threat_counts.update(incident["threats"])
+        for bucket in later_buckets:
+            threat_counts.update(self._bucket_threats.get(bucket, {}))
+        # Eviction can leave zero counts behind, unary plus drops them
+        return dict((+threat_counts).most_common())
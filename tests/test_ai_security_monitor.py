@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+import pytest
+
+import ai_security_monitor
+from ai_security_monitor import AISecurityMonitor
+
+
+class FakeSMTP:
+    """
+    Stand-in for smtplib.SMTP that records sent messages
+    """
+    sent = []
+    
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+    
+    def starttls(self):
+        pass
+    
+    def login(self, username, password):
+        pass
+    
+    def noop(self):
+        return 250, b"OK"
+    
+    def send_message(self, msg):
+        FakeSMTP.sent.append(msg)
+    
+    def quit(self):
+        pass
+    
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def alert_settings():
+    return {
+        "email_recipients": ["security@example.com"],
+        "smtp_settings": {
+            "server": "smtp.example.com",
+            "port": 587,
+            "sender": "alerts@example.com"
+        },
+        "alert_thresholds": {
+            "max_requests_per_minute": 100,
+            "suspicious_pattern_threshold": 0.8,
+            "failed_attempts_threshold": 5
+        }
+    }
+
+
+@pytest.fixture
+def monitor(alert_settings, tmp_path, monkeypatch):
+    FakeSMTP.sent = []
+    monkeypatch.setattr(ai_security_monitor.smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(ai_security_monitor, "_SMTP_POOL", {})
+    monitor = AISecurityMonitor("test_model", alert_settings, str(tmp_path / "security.log"))
+    yield monitor
+    monitor.close()
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.longdouble])
+def test_unusual_float_dtypes_are_analyzed(monitor, dtype):
+    result = monitor._analyze_input_patterns(np.ones(10, dtype=dtype))
+    assert result["suspicious_patterns"] == []
+    
+    result = monitor._analyze_input_patterns(np.array([1, 2e6], dtype=dtype))
+    assert result["suspicious_patterns"] == ["extreme_values"]
+
+
+def test_close_persists_and_alerts_pending_incidents(monitor):
+    monitor.detect_threat({"ip_address": "10.0.0.1", "input_data": np.zeros(10)})
+    monitor.close()
+    
+    assert [incident["ip_address"] for incident in monitor.incident_log] == ["10.0.0.1"]
+    assert len(FakeSMTP.sent) == 1
+    assert "HIGH" in FakeSMTP.sent[0]["Subject"]
+
+
+def test_incidents_after_close_are_persisted_inline(monitor):
+    monitor.close()
+    monitor.detect_threat({"ip_address": "10.0.0.2", "input_data": np.zeros(10)})
+    
+    assert [incident["ip_address"] for incident in monitor.incident_log] == ["10.0.0.2"]
+    assert len(FakeSMTP.sent) == 1
+
+
+def test_no_incident_lost_when_closing_under_load(monitor):
+    def send_requests():
+        for _ in range(200):
+            monitor.detect_threat({"ip_address": "10.0.0.3", "input_data": np.zeros(10)})
+    
+    threads = [threading.Thread(target=send_requests) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    monitor.close()
+    for thread in threads:
+        thread.join()
+    
+    assert len(monitor.incident_log) == 800
+    assert len(FakeSMTP.sent) == 800
+
+
+def test_incident_log_size_must_be_positive(alert_settings):
+    alert_settings["incident_log_size"] = 0
+    with pytest.raises(ValueError):
+        AISecurityMonitor("test_model", alert_settings)
+
+
+def test_incident_log_evicts_oldest(alert_settings, tmp_path, monkeypatch):
+    alert_settings["incident_log_size"] = 2
+    monkeypatch.setattr(ai_security_monitor.smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(ai_security_monitor, "_SMTP_POOL", {})
+    monitor = AISecurityMonitor("test_model", alert_settings, str(tmp_path / "security.log"))
+    for ip in ["10.0.0.1", "10.0.0.2", "10.0.0.3"]:
+        monitor.detect_threat({"ip_address": ip, "input_data": np.zeros(10)})
+    monitor.close()
+    
+    assert [incident["ip_address"] for incident in monitor.incident_log] == ["10.0.0.2", "10.0.0.3"]
+    assert monitor.get_incident_summary()["total_incidents"] == 2
+
+
+def test_object_arrays_are_reported_as_analysis_error(monitor):
+    result = monitor._analyze_input_patterns([1, 2**70])
+    assert result["suspicious_patterns"] == ["analysis_error"]